@@ -0,0 +1,328 @@
+import hashlib
+import json
+import os
+import zipfile
+from datetime import datetime
+
+# ================= 配置区域 =================
+INDEX_FILE = 'index.json'
+MANIFEST_NAME = 'manifest.json'
+SNAPSHOT_PREFIX = '快照_'
+
+
+# ===========================================
+# 存储结构 (位于各模块的 '历史备份' 目录下)：
+#   快照_<时间戳>_<序号>.zip   每次归档一个压缩包，内含 manifest.json 与本次新出现的文件内容 objects/<sha256>
+#   index.json                 内容哈希 -> 所在压缩包，用于去重；丢失时可从各快照的 manifest 重建
+# 与历史完全相同的文件只记录哈希，不重复存储，因此后续快照可能引用较早快照中的内容：
+# 不要手动删除快照压缩包，请通过 delete_snapshot (主菜单 [5]) 删除，被引用的内容会先转存到其他快照。
+# 快照顺序以 manifest 中严格递增的序号 seq 为准，不依赖文件名排序。
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot_archives(store_dir):
+    if not os.path.exists(store_dir):
+        return []
+    return sorted(f for f in os.listdir(store_dir)
+                  if f.startswith(SNAPSHOT_PREFIX) and f.endswith('.zip'))
+
+
+def _read_manifest(store_dir, archive_name):
+    with zipfile.ZipFile(os.path.join(store_dir, archive_name)) as zf:
+        return json.loads(zf.read(MANIFEST_NAME).decode('utf-8'))
+
+
+def _rebuild_index(manifests):
+    objects = {}
+    for manifest in manifests:
+        for entry in manifest['files']:
+            objects.setdefault(entry['sha256'], entry['archive'])
+    return {'objects': objects, 'next_seq': max((m['seq'] for m in manifests), default=0) + 1}
+
+
+def _load_index(store_dir):
+    """读取内容索引，不存在或损坏时从各快照重建"""
+    index_path = os.path.join(store_dir, INDEX_FILE)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return _rebuild_index(list_snapshots(store_dir))
+
+
+def _save_index(store_dir, index):
+    index_path = os.path.join(store_dir, INDEX_FILE)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+
+def create_snapshot(store_dir, file_paths, label=''):
+    """
+    将一组文件归档为一个快照
+    返回 (快照编号, 新存入的文件数)；内容已在历史中出现过的文件只记录引用
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    index = _load_index(store_dir)
+    objects = index['objects']
+    # 只信任仍然存在的压缩包：用户删掉旧快照后，其中的内容必须重新存入
+    existing = set(_snapshot_archives(store_dir))
+
+    # 序号只增不减，即使最新的快照被删除，新快照也不会沿用旧名称
+    now = datetime.now()
+    seq = index.get('next_seq') or _rebuild_index(list_snapshots(store_dir))['next_seq']
+    while True:
+        snapshot_id = f"{now:%Y%m%d_%H%M%S}_{seq:04d}"
+        archive_name = f"{SNAPSHOT_PREFIX}{snapshot_id}.zip"
+        if not os.path.exists(os.path.join(store_dir, archive_name)):
+            break
+        seq += 1
+
+    manifest = {
+        'id': snapshot_id,
+        'seq': seq,
+        'label': label,
+        'created': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'files': [],
+    }
+    new_objects = {}
+
+    tmp_path = os.path.join(store_dir, archive_name + '.tmp')
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for path in file_paths:
+            sha256 = _file_sha256(path)
+            holder = new_objects.get(sha256)
+            if holder is None:
+                holder = objects.get(sha256)
+                if holder not in existing:
+                    zf.write(path, f"objects/{sha256}")
+                    new_objects[sha256] = archive_name
+                    holder = archive_name
+            manifest['files'].append({
+                'name': os.path.basename(path),
+                'sha256': sha256,
+                'size': os.path.getsize(path),
+                'archive': holder,
+            })
+        zf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1))
+    os.replace(tmp_path, os.path.join(store_dir, archive_name))
+
+    objects.update(new_objects)
+    index['next_seq'] = seq + 1
+    _save_index(store_dir, index)
+    return snapshot_id, len(new_objects)
+
+
+def list_snapshots(store_dir):
+    """
+    按创建顺序 (序号、创建时间) 列出所有快照的 manifest，损坏的压缩包跳过并提示
+    每个 manifest 额外带有 'archive' (所在压缩包) 与 'missing' (内容所在压缩包已不存在的文件名列表)
+    """
+    archives = _snapshot_archives(store_dir)
+    existing = set(archives)
+    manifests = []
+    for name in archives:
+        try:
+            manifest = _read_manifest(store_dir, name)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            print(f"⚠️ 快照已损坏，已跳过: {name} ({e})")
+            continue
+        # 旧版快照没有序号，排在所有新快照之前
+        manifest.setdefault('seq', 0)
+        manifest['archive'] = name
+        manifest['missing'] = [entry['name'] for entry in manifest['files'] if entry['archive'] not in existing]
+        manifests.append(manifest)
+    manifests.sort(key=lambda m: (m['seq'], m['created']))
+    return manifests
+
+
+def _get_manifest(store_dir, snapshot_id):
+    for manifest in list_snapshots(store_dir):
+        if manifest['id'] == snapshot_id:
+            return manifest
+    raise KeyError(f"快照不存在: {snapshot_id}")
+
+
+def _read_object(store_dir, entry):
+    with zipfile.ZipFile(os.path.join(store_dir, entry['archive'])) as zf:
+        return zf.read(f"objects/{entry['sha256']}")
+
+
+def read_file(store_dir, snapshot_id, file_name):
+    """读取某个快照中指定文件的内容 (bytes)"""
+    for entry in _get_manifest(store_dir, snapshot_id)['files']:
+        if entry['name'] == file_name:
+            return _read_object(store_dir, entry)
+    raise KeyError(f"快照 {snapshot_id} 中没有文件: {file_name}")
+
+
+def find_latest(store_dir, file_name):
+    """返回包含指定文件的最近一个快照编号，没有则返回 None"""
+    for manifest in reversed(list_snapshots(store_dir)):
+        if any(entry['name'] == file_name for entry in manifest['files']):
+            return manifest['id']
+    return None
+
+
+def restore_snapshot(store_dir, snapshot_id, dest_dir):
+    """
+    将快照中的全部文件还原到 dest_dir
+    返回 (已还原的文件路径列表, 无法还原的文件名列表)，单个文件缺失不影响其余文件
+    """
+    manifest = _get_manifest(store_dir, snapshot_id)
+    os.makedirs(dest_dir, exist_ok=True)
+    restored = []
+    missing = []
+    for entry in manifest['files']:
+        try:
+            data = _read_object(store_dir, entry)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            missing.append(entry['name'])
+            continue
+        dest_path = os.path.join(dest_dir, entry['name'])
+        with open(dest_path, 'wb') as f:
+            f.write(data)
+        restored.append(dest_path)
+    return restored, missing
+
+
+def _rewrite_archive(store_dir, manifest, added_objects):
+    """重写一个快照压缩包：保留原有内容，加入 added_objects {sha256: bytes}，并写入更新后的 manifest"""
+    archive_path = os.path.join(store_dir, manifest['archive'])
+    stored = {key: value for key, value in manifest.items() if key not in ('archive', 'missing')}
+    tmp_path = archive_path + '.tmp'
+    with zipfile.ZipFile(archive_path) as src, \
+            zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            if item.filename != MANIFEST_NAME:
+                dst.writestr(item, src.read(item.filename))
+        for sha256, data in added_objects.items():
+            dst.writestr(f"objects/{sha256}", data)
+        dst.writestr(MANIFEST_NAME, json.dumps(stored, ensure_ascii=False, indent=1))
+    os.replace(tmp_path, archive_path)
+
+
+def delete_snapshot(store_dir, snapshot_id):
+    """
+    删除一个快照，其中仍被其他快照引用的内容先转存到最早引用它的快照中
+    返回转存的文件内容数
+    """
+    manifests = list_snapshots(store_dir)
+    target = next((m for m in manifests if m['id'] == snapshot_id), None)
+    if target is None:
+        raise KeyError(f"快照不存在: {snapshot_id}")
+    doomed = target['archive']
+    survivors = [m for m in manifests if m is not target]
+
+    # 每个被引用的内容交给最早引用它的快照保存
+    new_holders = {}
+    for manifest in survivors:
+        for entry in manifest['files']:
+            if entry['archive'] == doomed:
+                new_holders.setdefault(entry['sha256'], manifest['archive'])
+
+    moved = {}
+    with zipfile.ZipFile(os.path.join(store_dir, doomed)) as zf:
+        for sha256, holder in new_holders.items():
+            moved.setdefault(holder, {})[sha256] = zf.read(f"objects/{sha256}")
+
+    affected = [m for m in survivors if any(entry['archive'] == doomed for entry in m['files'])]
+    # 先写入接收内容的快照，再改写只含引用的快照，中途中断也不会出现指向空处的引用
+    affected.sort(key=lambda m: m['archive'] not in moved)
+    for manifest in affected:
+        for entry in manifest['files']:
+            if entry['archive'] == doomed:
+                entry['archive'] = new_holders[entry['sha256']]
+        _rewrite_archive(store_dir, manifest, moved.get(manifest['archive'], {}))
+
+    index = _rebuild_index(survivors)
+    index['next_seq'] = max(index['next_seq'], _load_index(store_dir).get('next_seq', 0))
+    _save_index(store_dir, index)
+    os.remove(os.path.join(store_dir, doomed))
+    return len(new_holders)
+
+
+def run_archive_manager():
+    # 延迟导入，避免与各管理模块循环引用
+    import manager_students
+    import manager_inventory
+
+    stores = [
+        ('🎓 学生名单', manager_students.ARCHIVE_DIR),
+        ('🥦 食材入库', manager_inventory.ARCHIVE_DIR),
+    ]
+
+    print("\n" + "=" * 50)
+    print("📦 历史备份管理")
+    print("说明：查看各模块的归档快照，并可将任意快照还原为普通文件。")
+    print("⚠️ 后续快照可能引用较早快照中的内容，请勿手动删除 快照_*.zip，需要清理时请在此处删除。")
+    print("=" * 50)
+    for idx, (name, path) in enumerate(stores, 1):
+        print(f"  [{idx}] {name} ({path})")
+
+    choice = input("\n👉 请选择备份库 (回车返回): ").strip()
+    if not choice.isdigit() or not 1 <= int(choice) <= len(stores):
+        return
+    store_name, store_dir = stores[int(choice) - 1]
+
+    try:
+        snapshots = list_snapshots(store_dir)
+    except Exception as e:
+        print(f"❌ 读取备份失败: {e}")
+        input("按回车键返回...")
+        return
+
+    if not snapshots:
+        print(f"📭 {store_name} 暂无归档快照。")
+        input("按回车键返回...")
+        return
+
+    print("-" * 50)
+    for idx, manifest in enumerate(snapshots, 1):
+        total_size = sum(entry['size'] for entry in manifest['files'])
+        missing_note = f"  ⚠️ 缺失 {len(manifest['missing'])} 个" if manifest['missing'] else ""
+        print(f"{idx:<4} {manifest['created']}  {manifest['label']:<12} "
+              f"{len(manifest['files'])} 个文件, {total_size / 1024:.0f} KB{missing_note}")
+    print("-" * 50)
+
+    choice = input("👉 输入序号还原该快照，输入 d+序号 (如 d1) 删除该快照 (回车返回): ").strip().lower()
+    delete = choice.startswith('d')
+    if delete:
+        choice = choice[1:]
+    if not choice.isdigit() or not 1 <= int(choice) <= len(snapshots):
+        return
+    snapshot_id = snapshots[int(choice) - 1]['id']
+
+    if delete:
+        if input(f"👉 确认删除快照 {snapshot_id}？[y/N]: ").strip().lower() != 'y':
+            print("🚫 操作已取消。")
+        else:
+            try:
+                moved = delete_snapshot(store_dir, snapshot_id)
+                print(f"🗑️ 已删除快照 {snapshot_id}，{moved} 个仍被引用的文件内容已转存到其他快照。")
+            except Exception as e:
+                print(f"❌ 删除失败: {e}")
+        input("按回车键返回主菜单...")
+        return
+
+    dest_dir = os.path.join(store_dir, f"还原_{snapshot_id}")
+
+    try:
+        restored, missing = restore_snapshot(store_dir, snapshot_id, dest_dir)
+        print(f"✅ 已还原 {len(restored)} 个文件至: {dest_dir}")
+        if missing:
+            print(f"⚠️ {len(missing)} 个文件的内容所在快照已被删除或损坏，无法还原: {', '.join(missing)}")
+    except Exception as e:
+        print(f"❌ 还原失败: {e}")
+    input("按回车键返回主菜单...")
+
+
+if __name__ == "__main__":
+    run_archive_manager()
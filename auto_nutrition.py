@@ -1,6 +1,8 @@
 import time
 import os
+import json
 import datetime
+import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
@@ -19,6 +21,19 @@ FOLDER_PATH = os.path.join(CURRENT_DIR, 'data', '2_食材入库管理', '输出
 # 目标网址
 TARGET_URL = "https://yyjh.xszz.edu.cn/yygsjh/dlsp/cgqdwhSchool"
 
+# 核对未通过的日期写入此队列，下次录入时可只处理这些文件
+RESUME_QUEUE_FILE = os.path.join(CURRENT_DIR, 'data', '2_食材入库管理', '待补录队列.json')
+
+# 上传后核对：平台列表中用于匹配的列名关键字
+DATE_COLUMN_KEYWORDS = ['入库日期', '采购日期']
+TOTAL_COLUMN_KEYWORDS = ['金额', '合计', '小计']
+AMOUNT_TOLERANCE = 0.01
+MAX_LISTING_PAGES = 50
+
+# 入库单模板中数据起始行与“小计”列 (与 manager_inventory 写入位置一致)
+TEMPLATE_START_ROW = 2
+TOTAL_COLUMN_INDEX = 4
+
 
 # ===========================================
 
@@ -82,23 +97,325 @@ def select_dropdown_option(driver, wait, placeholder_text, target_value):
         print(f"      ❌ 选择下拉框失败: {e}")
 
 
-def start_automation():
-    print("\n" + "=" * 50)
-    print("🤖 平台自动录入系统 (Selenium)")
-    print("说明：自动读取【输出结果】中的Excel文件并上传至网页。")
-    print("=" * 50)
+def connect_browser():
+    """接管已通过专用快捷方式打开的 Chrome，失败时返回 None"""
     print("正在尝试连接已打开的浏览器...")
-
     try:
         chrome_options = Options()
         chrome_options.add_experimental_option("debuggerAddress", "127.0.0.1:9222")
         service = Service(ChromeDriverManager().install())
         driver = webdriver.Chrome(service=service, options=chrome_options)
         print("✅ 成功连接到浏览器！")
+        return driver
     except Exception as e:
         print("❌ 连接失败！请检查以下两点：")
         print("1. 是否已通过【专用快捷方式】打开了Chrome浏览器？")
         print("2. 是否已在浏览器中登录并停留在【食材入库维护】页面？")
+        return None
+
+
+def upload_file(driver, full_file_path):
+    """
+    在【食材入库维护】页面上传单个入库单文件
+    出错时直接抛出异常，由调用方决定如何处理
+    """
+    target_date = os.path.basename(full_file_path).split('.')[0]
+    academic_year, semester = get_academic_info(target_date)
+    print(f"   📅 日期: {target_date} -> 学年: {academic_year} | 学期: {semester}")
+
+    wait = WebDriverWait(driver, 15)
+
+    # === 1. 顶部筛选 ===
+    print("   1. 正在切换学期...")
+    select_dropdown_option(driver, wait, "请选择学年", academic_year)
+    select_dropdown_option(driver, wait, "请选择学期", semester)
+
+    print("      点击查询...")
+    query_btn = driver.find_element(By.XPATH, "//button[contains(., '查询')]")
+    click_element_forcefully(driver, query_btn)
+    time.sleep(2)
+
+    # === 2. 点击“采购食材录入” ===
+    print("   2. 打开录入弹窗...")
+    try:
+        entry_btn = wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[contains(., '采购食材录入')]")
+        ))
+        click_element_forcefully(driver, entry_btn)
+    except TimeoutException:
+        print("   ⚠️ 按钮没反应，刷新网页重来...")
+        driver.refresh()
+        time.sleep(5)
+        entry_btn = wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[contains(., '采购食材录入')]")
+        ))
+        click_element_forcefully(driver, entry_btn)
+
+    time.sleep(2)
+
+    # === 3. 填写表单 ===
+    print("   3. 填写信息...")
+    try:
+        dazong_radio = wait.until(EC.presence_of_element_located(
+            (By.XPATH, "//label[contains(., '大宗食材')]")
+        ))
+        click_element_forcefully(driver, dazong_radio)
+    except:
+        pass
+    time.sleep(0.5)
+
+    # 填写日期
+    js_force_date = f"""
+        var inputs = document.querySelectorAll("input");
+        inputs.forEach(function(input) {{
+            var p = input.placeholder;
+            if (p && (p.indexOf('采购日期') > -1 || p.indexOf('入库日期') > -1)) {{
+                input.removeAttribute('readonly');
+                input.value = '{target_date}';
+                input.dispatchEvent(new Event('input', {{ bubbles: true }}));
+                input.dispatchEvent(new Event('change', {{ bubbles: true }}));
+                input.dispatchEvent(new Event('blur', {{ bubbles: true }}));
+            }}
+        }});
+    """
+    driver.execute_script(js_force_date)
+    time.sleep(1)
+
+    inherit_no_radio = driver.find_element(By.XPATH,
+                                           "//label[contains(@class,'el-radio')][.//span[text()='否']]")
+    click_element_forcefully(driver, inherit_no_radio)
+
+    # === 4. 点击“清单导入” ===
+    print("   4. 打开导入窗口...")
+    time.sleep(1)
+    import_btn = wait.until(EC.element_to_be_clickable(
+        (By.XPATH, "//button[contains(., '清单导入')]")
+    ))
+    click_element_forcefully(driver, import_btn)
+
+    # === 5. 上传文件 ===
+    print("   5. 正在上传文件 (等待5秒)...")
+    upload_input = wait.until(EC.presence_of_element_located(
+        (By.XPATH, "//div[@aria-label='清单导入']//input[@type='file']")
+    ))
+    upload_input.send_keys(full_file_path)
+
+    time.sleep(5)
+
+    # === 6. 点击“清单导入”弹窗的“确定” ===
+    print("   6. 确认导入...")
+    try:
+        confirm_import_btn = wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//div[@aria-label='清单导入']//button[contains(., '确')]")
+        ))
+        click_element_forcefully(driver, confirm_import_btn)
+    except Exception:
+        all_confirm_btns = driver.find_elements(By.XPATH, "//button[contains(., '确')]")
+        if all_confirm_btns:
+            click_element_forcefully(driver, all_confirm_btns[-1])
+
+    print("      等待数据回填 (3秒)...")
+    time.sleep(3)
+
+    # === 7. 点击主界面的“确定”保存 ===
+    print("   7. 保存并提交...")
+    final_confirm_btn = wait.until(EC.element_to_be_clickable(
+        (By.XPATH,
+         "//div[@aria-label='食材入库维护']//div[contains(@class, 'dialog-footer')]//button[contains(., '确')]")
+    ))
+    driver.execute_script("arguments[0].scrollIntoView();", final_confirm_btn)
+    time.sleep(1)
+    click_element_forcefully(driver, final_confirm_btn)
+
+
+# 一次性抓取当前可见表格的表头与全部行，并返回是否还有下一页
+JS_SCRAPE_TABLE = """
+    var tables = Array.prototype.filter.call(document.querySelectorAll('.el-table'), function(t) {
+        return t.offsetParent !== null;
+    });
+    if (!tables.length) { return null; }
+    var table = tables[0];
+    var headers = Array.prototype.map.call(
+        table.querySelectorAll('.el-table__header-wrapper th'),
+        function(th) { return th.innerText.trim(); });
+    var rows = Array.prototype.map.call(
+        table.querySelectorAll('.el-table__body-wrapper tbody tr'),
+        function(tr) {
+            return Array.prototype.map.call(tr.querySelectorAll('td'), function(td) { return td.innerText.trim(); });
+        });
+    var next = document.querySelector('.el-pagination .btn-next');
+    return {headers: headers, rows: rows, has_next: !!(next && !next.disabled)};
+"""
+
+# 当前页码；加载遮罩仍可见时返回 null，表示新一页的数据尚未就绪
+JS_ACTIVE_PAGE = """
+    var loading = Array.prototype.some.call(document.querySelectorAll('.el-loading-mask'), function(m) {
+        return m.offsetParent !== null;
+    });
+    var active = document.querySelector('.el-pagination .el-pager li.active');
+    return (loading || !active) ? null : active.innerText.trim();
+"""
+
+
+def _find_column(headers, keywords):
+    for keyword in keywords:
+        for idx, header in enumerate(headers):
+            if keyword in header:
+                return idx
+    return None
+
+
+def _parse_amount(text):
+    try:
+        return float(str(text).replace(',', '').replace('¥', '').strip())
+    except ValueError:
+        return None
+
+
+def read_expected_total(full_file_path):
+    """读取生成的入库单中所有行的小计之和"""
+    df = pd.read_excel(full_file_path, header=None)
+    return float(pd.to_numeric(df.iloc[TEMPLATE_START_ROW:, TOTAL_COLUMN_INDEX], errors='coerce').sum())
+
+
+def scrape_listing(driver):
+    """
+    抓取当前查询结果的全部记录 (每页只执行一次 JS)
+    返回 ({日期: [金额, ...]}, 是否已抓取全部页)；找不到金额列时金额为 None
+    """
+    records = {}
+    for page_no in range(1, MAX_LISTING_PAGES + 1):
+        page = driver.execute_script(JS_SCRAPE_TABLE)
+        if not page:
+            return records, True
+
+        date_idx = _find_column(page['headers'], DATE_COLUMN_KEYWORDS)
+        total_idx = _find_column(page['headers'], TOTAL_COLUMN_KEYWORDS)
+        if date_idx is None:
+            raise ValueError(f"列表中未找到日期列，表头为: {page['headers']}")
+
+        for row in page['rows']:
+            if len(row) <= date_idx:
+                continue
+            date_str = row[date_idx][:10]
+            amount = _parse_amount(row[total_idx]) if total_idx is not None and len(row) > total_idx else None
+            records.setdefault(date_str, []).append(amount)
+
+        if not page['has_next']:
+            return records, True
+        if page_no == MAX_LISTING_PAGES:
+            break
+
+        current = driver.execute_script(JS_ACTIVE_PAGE)
+        next_btn = driver.find_element(By.CSS_SELECTOR, '.el-pagination .btn-next')
+        click_element_forcefully(driver, next_btn)
+        try:
+            # 等到页码切换且加载完成，而不是固定等待
+            WebDriverWait(driver, 15).until(
+                lambda d: d.execute_script(JS_ACTIVE_PAGE) not in (None, current))
+        except TimeoutException:
+            print(f"   ⚠️ 第 {page_no + 1} 页加载超时，只核对了前 {page_no} 页。")
+            return records, False
+
+    print(f"   ⚠️ 列表超过 {MAX_LISTING_PAGES} 页，只核对了前 {MAX_LISTING_PAGES} 页。")
+    return records, False
+
+
+def load_resume_queue():
+    """读取待补录队列，返回文件名列表"""
+    try:
+        with open(RESUME_QUEUE_FILE, 'r', encoding='utf-8') as f:
+            return [item['file'] for item in json.load(f)]
+    except (OSError, ValueError, KeyError, TypeError):
+        return []
+
+
+def save_resume_queue(problems):
+    with open(RESUME_QUEUE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(problems, f, ensure_ascii=False, indent=1)
+
+
+def verify_uploads(driver, file_paths):
+    """
+    批量核对：每个学期只查询一次平台列表，与本次上传的日期和金额逐一比对
+    缺失、金额不符或未能核对的日期写入待补录队列，返回问题列表
+    """
+    print("\n" + "=" * 50)
+    print("🔎 正在核对平台记录...")
+
+    terms = {}
+    problems = []
+    for path in file_paths:
+        target_date = os.path.basename(path).split('.')[0]
+        term = get_academic_info(target_date)
+        if term[0] is None:
+            # 文件名不是日期，无法确定学期，同样记入队列而不是静默跳过
+            problems.append({'file': os.path.basename(path), 'date': target_date, 'reason': '未能核对 (文件名不是日期)'})
+            continue
+        terms.setdefault(term, []).append((target_date, path))
+
+    wait = WebDriverWait(driver, 15)
+    checked = 0
+    for (academic_year, semester), items in terms.items():
+        print(f"   📅 {academic_year} {semester}: 核对 {len(items)} 个日期")
+        try:
+            select_dropdown_option(driver, wait, "请选择学年", academic_year)
+            select_dropdown_option(driver, wait, "请选择学期", semester)
+            query_btn = driver.find_element(By.XPATH, "//button[contains(., '查询')]")
+            click_element_forcefully(driver, query_btn)
+            time.sleep(2)
+
+            records, complete = scrape_listing(driver)
+        except Exception as e:
+            # 单个学期查询失败不影响其他学期，这些日期记为未能核对，确保队列反映本次结果
+            print(f"   ❌ 查询失败: {e}")
+            problems.extend({'file': os.path.basename(path), 'date': target_date, 'reason': '未能核对 (查询失败)'}
+                            for target_date, path in items)
+            continue
+
+        for target_date, path in items:
+            file_name = os.path.basename(path)
+            if target_date not in records:
+                # 列表没有抓全时，找不到不代表平台没有记录
+                reason = '平台无记录' if complete else '未能核对 (列表未抓取完整)'
+                problems.append({'file': file_name, 'date': target_date, 'reason': reason})
+                if complete:
+                    checked += 1
+                continue
+
+            amounts = [a for a in records[target_date] if a is not None]
+            if not amounts:
+                checked += 1
+                continue
+            try:
+                expected = read_expected_total(path)
+            except Exception as e:
+                print(f"   ❌ 读取 {file_name} 失败: {e}")
+                problems.append({'file': file_name, 'date': target_date, 'reason': '未能核对 (读取入库单失败)'})
+                continue
+            checked += 1
+            if not any(abs(a - expected) < AMOUNT_TOLERANCE for a in amounts):
+                problems.append({'file': file_name, 'date': target_date,
+                                 'reason': f'金额不符 (应为 {expected:.2f}，平台为 {", ".join(f"{a:.2f}" for a in amounts)})'})
+
+    save_resume_queue(problems)
+    if problems:
+        print(f"⚠️ 共 {len(file_paths)} 个日期，已核对 {checked} 个，"
+              f"发现 {len(problems)} 个问题，已写入待补录队列: {RESUME_QUEUE_FILE}")
+        for item in problems:
+            print(f"   ❌ {item['date']}: {item['reason']}")
+    else:
+        print(f"✅ 全部 {checked} 个日期核对无误。")
+    return problems
+
+
+def start_automation():
+    print("\n" + "=" * 50)
+    print("🤖 平台自动录入系统 (Selenium)")
+    print("说明：自动读取【输出结果】中的Excel文件并上传至网页。")
+    print("=" * 50)
+    driver = connect_browser()
+    if driver is None:
         input("按回车键返回主菜单...")
         return
 
@@ -111,6 +428,12 @@ def start_automation():
     file_list = [f for f in os.listdir(FOLDER_PATH) if f.endswith('.xls') or f.endswith('.xlsx')]
     file_list.sort()
 
+    queued = [f for f in load_resume_queue() if f in file_list]
+    if queued:
+        print(f"📌 上次核对发现 {len(queued)} 个日期需要补录: {', '.join(f.split('.')[0] for f in queued)}")
+        if input("👉 只处理待补录的文件？[Y/n]: ").strip().lower() != 'n':
+            file_list = queued
+
     if not file_list:
         print("❌ 文件夹里没有找到 Excel 文件！")
         input("按回车键返回主菜单...")
@@ -130,117 +453,13 @@ def start_automation():
     for index, file_name in enumerate(file_list, 1):
         full_file_path = os.path.join(FOLDER_PATH, file_name)
         target_date = file_name.split('.')[0]
-        academic_year, semester = get_academic_info(target_date)
 
         print(f"\n[{index}/{len(file_list)}] 处理文件: {file_name}")
-        print(f"   📅 日期: {target_date} -> 学年: {academic_year} | 学期: {semester}")
 
         try:
-            wait = WebDriverWait(driver, 15)
-
-            # === 1. 顶部筛选 ===
-            print("   1. 正在切换学期...")
-            select_dropdown_option(driver, wait, "请选择学年", academic_year)
-            select_dropdown_option(driver, wait, "请选择学期", semester)
-
-            print("      点击查询...")
-            query_btn = driver.find_element(By.XPATH, "//button[contains(., '查询')]")
-            click_element_forcefully(driver, query_btn)
-            time.sleep(2)
-
-            # === 2. 点击“采购食材录入” ===
-            print("   2. 打开录入弹窗...")
-            try:
-                entry_btn = wait.until(EC.element_to_be_clickable(
-                    (By.XPATH, "//button[contains(., '采购食材录入')]")
-                ))
-                click_element_forcefully(driver, entry_btn)
-            except TimeoutException:
-                print("   ⚠️ 按钮没反应，刷新网页重来...")
-                driver.refresh()
-                time.sleep(5)
-                entry_btn = wait.until(EC.element_to_be_clickable(
-                    (By.XPATH, "//button[contains(., '采购食材录入')]")
-                ))
-                click_element_forcefully(driver, entry_btn)
-
-            time.sleep(2)
+            upload_file(driver, full_file_path)
 
-            # === 3. 填写表单 ===
-            print("   3. 填写信息...")
-            try:
-                dazong_radio = wait.until(EC.presence_of_element_located(
-                    (By.XPATH, "//label[contains(., '大宗食材')]")
-                ))
-                click_element_forcefully(driver, dazong_radio)
-            except:
-                pass
-            time.sleep(0.5)
-
-            # 填写日期
-            js_force_date = f"""
-                var inputs = document.querySelectorAll("input");
-                inputs.forEach(function(input) {{
-                    var p = input.placeholder;
-                    if (p && (p.indexOf('采购日期') > -1 || p.indexOf('入库日期') > -1)) {{
-                        input.removeAttribute('readonly');
-                        input.value = '{target_date}';
-                        input.dispatchEvent(new Event('input', {{ bubbles: true }}));
-                        input.dispatchEvent(new Event('change', {{ bubbles: true }}));
-                        input.dispatchEvent(new Event('blur', {{ bubbles: true }}));
-                    }}
-                }});
-            """
-            driver.execute_script(js_force_date)
-            time.sleep(1)
-
-            inherit_no_radio = driver.find_element(By.XPATH,
-                                                   "//label[contains(@class,'el-radio')][.//span[text()='否']]")
-            click_element_forcefully(driver, inherit_no_radio)
-
-            # === 4. 点击“清单导入” ===
-            print("   4. 打开导入窗口...")
-            time.sleep(1)
-            import_btn = wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//button[contains(., '清单导入')]")
-            ))
-            click_element_forcefully(driver, import_btn)
-
-            # === 5. 上传文件 ===
-            print("   5. 正在上传文件 (等待5秒)...")
-            upload_input = wait.until(EC.presence_of_element_located(
-                (By.XPATH, "//div[@aria-label='清单导入']//input[@type='file']")
-            ))
-            upload_input.send_keys(full_file_path)
-
-            time.sleep(5)
-
-            # === 6. 点击“清单导入”弹窗的“确定” ===
-            print("   6. 确认导入...")
-            try:
-                confirm_import_btn = wait.until(EC.element_to_be_clickable(
-                    (By.XPATH, "//div[@aria-label='清单导入']//button[contains(., '确')]")
-                ))
-                click_element_forcefully(driver, confirm_import_btn)
-            except Exception:
-                all_confirm_btns = driver.find_elements(By.XPATH, "//button[contains(., '确')]")
-                if all_confirm_btns:
-                    click_element_forcefully(driver, all_confirm_btns[-1])
-
-            print("      等待数据回填 (3秒)...")
-            time.sleep(3)
-
-            # === 7. 点击主界面的“确定”保存 ===
-            print("   7. 保存并提交...")
-            final_confirm_btn = wait.until(EC.element_to_be_clickable(
-                (By.XPATH,
-                 "//div[@aria-label='食材入库维护']//div[contains(@class, 'dialog-footer')]//button[contains(., '确')]")
-            ))
-            driver.execute_script("arguments[0].scrollIntoView();", final_confirm_btn)
-            time.sleep(1)
-            click_element_forcefully(driver, final_confirm_btn)
-
-            print(f"   ✅ {target_date} 录入成功！")
+            print(f"   ✅ {target_date} 已提交！")
             print("   🛌 休息4秒...")
             time.sleep(4)
 
@@ -251,6 +470,12 @@ def start_automation():
 
     print("\n" + "=" * 50)
     print("🎉 所有文件处理完毕！")
+
+    try:
+        verify_uploads(driver, [os.path.join(FOLDER_PATH, f) for f in file_list])
+    except Exception as e:
+        print(f"❌ 核对失败: {e}")
+
     print("=" * 50)
     input("按回车键返回主菜单...")
 
@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+import time
+
+from manager_inventory import (init_workspace, load_purchase_list, handle_existing_outputs,
+                               iter_daily_files, OUTPUT_DIR)
+from auto_nutrition import connect_browser, upload_file, verify_uploads
+
+# ================= 配置区域 =================
+# 生成与上传之间的缓冲队列长度 (生成远快于上传，无需囤积太多文件)
+QUEUE_SIZE = 3
+
+# 队列结束标记
+_DONE = None
+
+
+# ===========================================
+
+class PipelineProgress:
+    """生成 / 上传两个阶段共享的进度计数 (线程安全)"""
+
+    def __init__(self, total):
+        self.total = total
+        self.generated = 0
+        self.uploaded = 0
+        self.generate_failed = 0
+        self.upload_failed = 0
+        self._lock = threading.Lock()
+
+    def mark(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def summary(self):
+        with self._lock:
+            return (f"生成 {self.generated}/{self.total} (失败 {self.generate_failed}) | "
+                    f"上传 {self.uploaded}/{self.total} (失败 {self.upload_failed})")
+
+
+def produce_files(df, file_queue, progress):
+    """生产者：逐日生成入库单，每完成一个就放入队列"""
+    try:
+        for date_str, save_path in iter_daily_files(df):
+            if save_path:
+                progress.mark('generated')
+                print(f"   [生成] ✅ {date_str}.xls  ({progress.summary()})")
+                # 队列满时阻塞，等待上传端消费
+                file_queue.put(os.path.abspath(save_path))
+            else:
+                progress.mark('generate_failed')
+    finally:
+        file_queue.put(_DONE)
+
+
+def run_pipeline():
+    print("\n" + "=" * 50)
+    print("🚀 生成并上传 (流水线模式)")
+    print("说明：每生成一天的入库单就立即上传，生成与上传同时进行。")
+    print("=" * 50)
+
+    init_workspace()
+
+    df = load_purchase_list()
+    if df is None:
+        input("按回车键返回...")
+        return
+
+    driver = connect_browser()
+    if driver is None:
+        input("按回车键返回主菜单...")
+        return
+
+    total = df['采购日期'].nunique()
+    progress = PipelineProgress(total)
+
+    print("-" * 50)
+    print(f"📄 待处理日期: {total} 个")
+    print("👉 请确保浏览器页面停留在【食材入库维护】。")
+    print("-" * 50)
+
+    confirm = input("👉 准备好后，按【y】开始，其他键取消: ").strip().lower()
+    if confirm != 'y':
+        print("🚫 操作已取消。")
+        return
+
+    # 确认开始后再处理旧文件，避免清空/归档后又取消导致输出目录为空
+    if not handle_existing_outputs():
+        return
+
+    file_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    producer = threading.Thread(target=produce_files, args=(df, file_queue, progress), daemon=True)
+
+    start_time = time.time()
+    producer.start()
+
+    # 消费者：Selenium 只能在单个线程中操作，上传放在主线程
+    index = 0
+    submitted = []
+    while True:
+        full_file_path = file_queue.get()
+        if full_file_path is _DONE:
+            break
+
+        index += 1
+        file_name = os.path.basename(full_file_path)
+        target_date = file_name.split('.')[0]
+        if index == 1:
+            print(f"   ⏱️ 首个文件已就绪，用时 {time.time() - start_time:.1f} 秒")
+
+        print(f"\n[{index}/{total}] 上传文件: {file_name}")
+        submitted.append(full_file_path)
+
+        try:
+            upload_file(driver, full_file_path)
+            progress.mark('uploaded')
+
+            print(f"   ✅ {target_date} 已提交！ ({progress.summary()})")
+            print("   🛌 休息4秒...")
+            time.sleep(4)
+
+        except Exception as e:
+            progress.mark('upload_failed')
+            print(f"❌ ERROR: 处理 {file_name} 时出错!")
+            print(f"   错误信息: {e}")
+            input("   👉 请手动纠正后按回车继续...")
+
+    producer.join()
+
+    try:
+        verify_uploads(driver, submitted)
+    except Exception as e:
+        print(f"❌ 核对失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"🎉 流水线完成！{progress.summary()}")
+    print(f"⏱️ 总用时: {time.time() - start_time:.1f} 秒")
+    print(f"📂 输出位置: {OUTPUT_DIR}")
+    print("=" * 50)
+    input("按回车键返回主菜单...")
+
+
+if __name__ == "__main__":
+    run_pipeline()
@@ -0,0 +1,189 @@
+"""
+名单核算内存基准
+
+两种方式都从同一个 .xlsx 名单文件开始，各自在全新的子进程中运行「读取 -> 调剂 -> 导出前还原」，
+对比整个过程的内存峰值 (tracemalloc + pyarrow 内存池，不含导入依赖本身；开启统计后读取较慢)：
+  原始：pd.read_excel 读入 object 表 + 改造前的调剂算法 (每个调出学生一个 dict、按班 pd.concat)
+  紧凑：load_roster 分块读入紧凑表示 + 按班级编码/行号调剂 + expand_roster
+
+用法: python benchmarks/bench_roster_memory.py [行数]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROWS = 200_000
+GRADES = ['2019级', '2020级', '2021级', '2022级', '2023级', '2024级']
+CLASSES_PER_GRADE = 12
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN = '子涵欣怡梓轩浩宇一诺雨泽思远佳琪俊杰嘉怡明轩晨曦'
+
+
+def build_roster(rows, seed=42):
+    import pandas as pd
+
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        '身份证号': [f"5201{rng.randrange(10 ** 13, 10 ** 14)}" for _ in range(rows)],
+        '姓名': [rng.choice(SURNAMES) + ''.join(rng.choices(GIVEN, k=rng.randint(1, 2))) for _ in range(rows)],
+        '年级': [rng.choice(GRADES) for _ in range(rows)],
+        '班级': [f"{rng.randint(1, CLASSES_PER_GRADE)}班" for _ in range(rows)],
+        '性别': [rng.choice(['男', '女']) for _ in range(rows)],
+        '民族': [rng.choice(['汉族', '苗族', '布依族', '侗族']) for _ in range(rows)],
+    })
+
+
+def build_targets(df, seed=7):
+    """随机让部分班级减员、部分班级增员，确保会触发借调与删除"""
+    rng = random.Random(seed)
+    sizes = df.groupby(['年级', '班级'], observed=True, sort=False).size().to_dict()
+    return {(str(g), str(c)): max(0, size + rng.randint(-5, 3)) for (g, c), size in sizes.items()}
+
+
+def prepare_input(rows):
+    """生成 (或复用已生成的) 名单文件，返回 (文件路径, 目标人数)"""
+    df = build_roster(rows)
+    path = os.path.join(tempfile.gettempdir(), f"bench_roster_{rows}.xlsx")
+    if not os.path.exists(path):
+        print(f"📝 正在生成测试名单: {path} (仅首次)")
+        df.to_excel(path, index=False)
+    return path, build_targets(df)
+
+
+def legacy_process_grade_data(grade_df, targets_map, grade_key):
+    """改造前的调剂算法 (原样保留，作为对照)"""
+    import pandas as pd
+
+    processed_dfs = []
+    change_records = []
+    classes = grade_df['班级'].unique()
+    spare_pool = []
+    class_core_data = {}
+    logs = []
+
+    for cls in classes:
+        cls_df = grade_df[grade_df['班级'] == cls]
+        current_count = len(cls_df)
+        target = targets_map.get((grade_key, cls), current_count)
+        if current_count > target:
+            class_core_data[cls] = cls_df.iloc[:target]
+            for idx, row in cls_df.iloc[target:].iterrows():
+                row_dict = row.to_dict()
+                row_dict['_origin_class'] = cls
+                spare_pool.append(row_dict)
+        else:
+            class_core_data[cls] = cls_df
+        logs.append((cls, target))
+
+    for cls, target in logs:
+        final_cls_df = class_core_data[cls].copy()
+        needed = target - len(final_cls_df)
+        borrowed_rows = []
+        while needed > 0 and spare_pool:
+            row_dict = spare_pool.pop(0)
+            change_records.append({
+                '年级': grade_key, '姓名': row_dict.get('姓名', '未知'),
+                '原班级': row_dict['_origin_class'], '操作': '借调变动',
+                '现班级': cls, '身份证号': row_dict.get('身份证号', '')
+            })
+            row_dict['班级'] = cls
+            del row_dict['_origin_class']
+            borrowed_rows.append(row_dict)
+            needed -= 1
+        if borrowed_rows:
+            final_cls_df = pd.concat([final_cls_df, pd.DataFrame(borrowed_rows)], ignore_index=True)
+        processed_dfs.append(final_cls_df)
+
+    for row_dict in spare_pool:
+        change_records.append({
+            '年级': grade_key, '姓名': row_dict.get('姓名', '未知'),
+            '原班级': row_dict['_origin_class'], '操作': '彻底删除',
+            '现班级': '无', '身份证号': row_dict.get('身份证号', '')
+        })
+    return processed_dfs, change_records
+
+
+def run_legacy(path, targets_map):
+    import pandas as pd
+
+    df = pd.read_excel(path)
+    final_dfs = []
+    all_changes = []
+    for grade in GRADES:
+        processed, changes = legacy_process_grade_data(df[df['年级'] == grade], targets_map, grade)
+        final_dfs.extend(processed)
+        all_changes.extend(changes)
+    return pd.concat(final_dfs), pd.DataFrame(all_changes)
+
+
+def run_compact(path, targets_map):
+    from manager_students import load_roster, reconcile_roster, expand_roster
+
+    df, original_dtypes = load_roster(path)
+    result_df, change_df = reconcile_roster(df, targets_map, GRADES)
+    return expand_roster(result_df, original_dtypes), change_df
+
+
+def _arrow_peak():
+    try:
+        import pyarrow
+        return pyarrow.default_memory_pool().max_memory()
+    except ImportError:
+        return 0
+
+
+def run_variant(variant, path, targets_map, result_queue):
+    # 先导入依赖，使峰值不包含库本身的内存
+    import pandas  # noqa: F401
+    import manager_students  # noqa: F401
+
+    arrow_before = _arrow_peak()
+    tracemalloc.start()
+    started = time.time()
+    runner = run_compact if variant == 'compact' else run_legacy
+    result_df, change_df = runner(path, targets_map)
+    elapsed = time.time() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Arrow 缓冲区由 pyarrow 自己的内存池分配，tracemalloc 统计不到，需单独累加 (两者峰值相加，偏保守)
+    peak += _arrow_peak() - arrow_before
+    result_queue.put((peak, elapsed, len(result_df), len(change_df)))
+
+
+def measure(variant, path, targets_map):
+    ctx = multiprocessing.get_context('spawn')
+    result_queue = ctx.Queue()
+    proc = ctx.Process(target=run_variant, args=(variant, path, targets_map, result_queue))
+    proc.start()
+    result = result_queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    import pandas as pd
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    mb = 1024 * 1024
+
+    print(f"📊 名单行数: {rows} (pandas {pd.__version__})")
+    path, targets_map = prepare_input(rows)
+    legacy = measure('legacy', path, targets_map)
+    compact = measure('compact', path, targets_map)
+
+    print(f"{'方式':<8}{'峰值(MB)':>12}{'耗时(秒)':>12}{'最终人数':>10}{'变动条数':>10}")
+    for label, (peak, elapsed, result_rows, changes) in [('原始', legacy), ('紧凑', compact)]:
+        print(f"{label:<8}{peak / mb:>12.1f}{elapsed:>12.1f}{result_rows:>10}{changes:>10}")
+
+    print(f"\n📉 峰值降低: {(1 - compact[0] / legacy[0]) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,9 @@ from manager_students import run_student_manager
 from manager_inventory import run_inventory_manager
 # 新增导入
 from auto_nutrition import start_automation
+from auto_pipeline import run_pipeline
+from archive_store import run_archive_manager
+from watch_daemon import run_watch_mode
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -21,6 +24,9 @@ def print_main_menu():
     print("  [1] 🎓 学生名单核算 (人数核对、跨班调剂)")
     print("  [2] 🥦 食材入库生成 (自动拆分每日入库单)")
     print("  [3] 🤖 平台自动录入 (Selenium自动化上传)")
+    print("  [4] 🚀 生成并上传 (流水线：边生成边上传)")
+    print("  [5] 📦 历史备份管理 (查看、还原归档快照)")
+    print("  [6] 👀 监听模式 (文件保存后自动重新生成)")
     print("  [0] ❌ 退出系统")
     print("-" * 60)
 
@@ -36,6 +42,12 @@ def main():
         elif choice == '3':
             # 调用自动化录入功能
             start_automation()
+        elif choice == '4':
+            run_pipeline()
+        elif choice == '5':
+            run_archive_manager()
+        elif choice == '6':
+            run_watch_mode()
         elif choice == '0':
             print("\n👋 感谢使用，再见！")
             sys.exit()
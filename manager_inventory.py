@@ -1,9 +1,10 @@
 import pandas as pd
 import os
-import shutil
+import hashlib
 import xlrd
 from xlutils.copy import copy
-import datetime
+
+import archive_store
 
 # ================= 配置区域 =================
 BASE_DIR = os.path.join('data', '2_食材入库管理')
@@ -34,7 +35,7 @@ def handle_existing_outputs():
     print(f"⚠️  检测到输出目录 '{os.path.basename(OUTPUT_DIR)}' 中已有 {len(files)} 个文件。")
     print("为避免混淆，建议先清理旧文件。请选择：")
     print("  [1] 🗑️  清空输出目录 (删除所有旧 .xls)")
-    print("  [2] 📦 归档当前文件 (移至 '历史备份')")
+    print("  [2] 📦 归档当前文件 (压缩存入 '历史备份'，相同内容不重复保存)")
     print("  [3] 🐢 保留旧文件 (新文件将直接混入/覆盖)")
     print("  [4] ❌ 取消操作")
     print("!" * 50)
@@ -54,16 +55,13 @@ def handle_existing_outputs():
 
         elif choice == '2':
             try:
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_folder_name = f"入库单备份_{timestamp}"
-                dest_path = os.path.join(ARCHIVE_DIR, backup_folder_name)
-
-                os.makedirs(dest_path)
+                paths = [os.path.join(OUTPUT_DIR, f) for f in files]
+                snapshot_id, added = archive_store.create_snapshot(ARCHIVE_DIR, paths, label='入库单备份')
 
-                for f in files:
-                    shutil.move(os.path.join(OUTPUT_DIR, f), os.path.join(dest_path, f))
+                for path in paths:
+                    os.remove(path)
 
-                print(f"📦 已将 {len(files)} 个文件移动至: {dest_path}")
+                print(f"📦 已将 {len(files)} 个文件归档为快照 {snapshot_id} (新内容 {added} 个，其余与历史相同)")
                 return True
             except Exception as e:
                 print(f"❌ 归档失败: {e}")
@@ -80,70 +78,147 @@ def handle_existing_outputs():
             print("输入无效。")
 
 
-def run_inventory_manager():
-    print("\n" + "=" * 50)
-    print("🥦 食材入库单生成工具")
-    print("说明：读取 '采购清单.xlsx'，按日期拆分并填充到 '.xls' 模板中。")
-    print("=" * 50)
+TARGET_COLUMNS = ["食材名称", "食材单位", "食材数量", "食材单价", "小计"]
 
-    init_workspace()
 
-    # 1. 检查必要文件
+def load_purchase_list():
+    """检查必要文件并读取采购清单，失败时返回 None"""
     if not os.path.exists(INPUT_FILE) or not os.path.exists(TEMPLATE_FILE):
         print(f"\n❌ 缺少文件，请检查: {BASE_DIR}")
-        input("按回车键返回...")
-        return
+        return None
 
-    # 2. 读取数据
     print(f"📖 正在读取采购清单...")
     try:
         df = pd.read_excel(INPUT_FILE, header=1)
         df.columns = df.columns.str.strip()
     except Exception as e:
         print(f"❌ 读取失败: {e}")
-        input("按回车键返回...")
-        return
+        return None
 
     if '采购日期' not in df.columns:
         print("❌ 错误：表格中未找到 '采购日期' 列。")
-        input("按回车键返回...")
-        return
+        return None
 
-    # 3. 处理旧文件 (核心更新)
-    if not handle_existing_outputs():
-        return
+    return df
 
-    grouped = df.groupby('采购日期')
-    target_columns = ["食材名称", "食材单位", "食材数量", "食材单价", "小计"]
 
-    count = 0
-    print("\n⚡ 开始处理...")
+def generate_daily_file(date, group):
+    """将单个日期的采购记录填入模板，返回 (日期字符串, 保存路径)"""
+    rb = xlrd.open_workbook(TEMPLATE_FILE, formatting_info=True)
+    wb = copy(rb)
+    ws = wb.get_sheet(0)
+
+    upload_data = group[TARGET_COLUMNS].copy()
+    start_row = 2
 
-    for date, group in grouped:
+    for r_idx, (_, row) in enumerate(upload_data.iterrows()):
+        ws.write(start_row + r_idx, 0, row['食材名称'])
+        ws.write(start_row + r_idx, 1, row['食材单位'])
+        ws.write(start_row + r_idx, 2, row['食材数量'])
+        ws.write(start_row + r_idx, 3, row['食材单价'])
+        ws.write(start_row + r_idx, 4, row['小计'])
+
+    date_str = _date_str(date)
+    save_path = os.path.join(OUTPUT_DIR, f"{date_str}.xls")
+
+    wb.save(save_path)
+    return date_str, save_path
+
+
+def iter_daily_files(df):
+    """
+    逐日生成入库单 (生成器)
+    每完成一个日期就产出 (日期字符串, 保存路径)，失败的日期产出 (日期, None)
+    """
+    for date, group in df.groupby('采购日期'):
         try:
-            rb = xlrd.open_workbook(TEMPLATE_FILE, formatting_info=True)
-            wb = copy(rb)
-            ws = wb.get_sheet(0)
+            yield generate_daily_file(date, group)
+        except Exception as e:
+            print(f"   ❌ 日期 {date} 处理失败: {e}")
+            yield _date_str(date), None
 
-            upload_data = group[target_columns].copy()
-            start_row = 2
 
-            for r_idx, (_, row) in enumerate(upload_data.iterrows()):
-                ws.write(start_row + r_idx, 0, row['食材名称'])
-                ws.write(start_row + r_idx, 1, row['食材单位'])
-                ws.write(start_row + r_idx, 2, row['食材数量'])
-                ws.write(start_row + r_idx, 3, row['食材单价'])
-                ws.write(start_row + r_idx, 4, row['小计'])
+def _date_str(date):
+    return str(date).split(' ')[0]
 
-            date_str = str(date).split(' ')[0]
-            save_path = os.path.join(OUTPUT_DIR, f"{date_str}.xls")
 
-            wb.save(save_path)
-            print(f"   ✅ 生成: {date_str}.xls")
-            count += 1
+def _group_signature(group):
+    row_hashes = pd.util.hash_pandas_object(group[TARGET_COLUMNS], index=False)
+    return hashlib.sha1(row_hashes.values.tobytes()).hexdigest()
 
+
+def _output_mtime(date_str):
+    try:
+        return os.path.getmtime(os.path.join(OUTPUT_DIR, f"{date_str}.xls"))
+    except OSError:
+        return None
+
+
+def date_signatures(df, newer_than=None):
+    """
+    计算每个采购日期的内容指纹 {日期字符串: 哈希}，用于判断哪些日期发生了变化
+    指定 newer_than (时间戳) 时只记录入库单存在且修改时间晚于它的日期
+    """
+    signatures = {}
+    for date, group in df.groupby('采购日期'):
+        date_str = _date_str(date)
+        if newer_than is not None:
+            mtime = _output_mtime(date_str)
+            if mtime is None or mtime <= newer_than:
+                continue
+        signatures[date_str] = _group_signature(group)
+    return signatures
+
+
+def regenerate_changed_dates(df, previous_signatures):
+    """
+    只重新生成内容有变化 (或入库单缺失) 的日期
+    返回 (最新指纹, 已重新生成的日期列表)
+    """
+    signatures = {}
+    generated = []
+    for date, group in df.groupby('采购日期'):
+        date_str = _date_str(date)
+        signature = _group_signature(group)
+        output_path = os.path.join(OUTPUT_DIR, f"{date_str}.xls")
+        if previous_signatures.get(date_str) == signature and os.path.exists(output_path):
+            signatures[date_str] = signature
+            continue
+        try:
+            generate_daily_file(date, group)
+            generated.append(date_str)
+            signatures[date_str] = signature
         except Exception as e:
+            # 失败的日期不记录指纹，下次变化时重试
             print(f"   ❌ 日期 {date} 处理失败: {e}")
+    return signatures, generated
+
+
+def run_inventory_manager():
+    print("\n" + "=" * 50)
+    print("🥦 食材入库单生成工具")
+    print("说明：读取 '采购清单.xlsx'，按日期拆分并填充到 '.xls' 模板中。")
+    print("=" * 50)
+
+    init_workspace()
+
+    # 1. 检查必要文件 & 2. 读取数据
+    df = load_purchase_list()
+    if df is None:
+        input("按回车键返回...")
+        return
+
+    # 3. 处理旧文件 (核心更新)
+    if not handle_existing_outputs():
+        return
+
+    count = 0
+    print("\n⚡ 开始处理...")
+
+    for date_str, save_path in iter_daily_files(df):
+        if save_path:
+            print(f"   ✅ 生成: {date_str}.xls")
+            count += 1
 
     print("\n" + "=" * 50)
     print(f"🎉 全部完成！共生成 {count} 个文件。")
@@ -1,17 +1,36 @@
 import pandas as pd
 import re
+import io
+import json
 import os
 import sys
 import time
-import shutil
+from collections import deque
 from datetime import datetime
 
+from openpyxl import load_workbook
+from pandas.api.types import union_categoricals
+
+import archive_store
+
 # ================= 配置区域 =================
 BASE_DIR = os.path.join('data', '1_学生名单管理')
 INPUT_FILE = os.path.join(BASE_DIR, '营养餐基本名单.xlsx')
 OUTPUT_FILE = os.path.join(BASE_DIR, '营养餐_最终核定表.xlsx')
+DELTA_FILE = os.path.join(BASE_DIR, '营养餐_差异名单.csv')
+TARGETS_FILE = os.path.join(BASE_DIR, '上次核定人数.json')  # 最近一次确认的各班目标人数
 ARCHIVE_DIR = os.path.join(BASE_DIR, '历史备份')  # 新增备份目录
 
+# 内部紧凑表示：分类列与字符串列
+CATEGORY_COLUMNS = ['年级', '班级']
+STRING_COLUMNS = ['姓名', '身份证号']
+EXTRA_CATEGORY_RATIO = 0.5  # 其他文本列不同取值不超过行数的一半时按分类列存储 (如性别、民族)
+ROSTER_CHUNK_ROWS = 20000  # 分块读取名单，避免一次性持有全部原始单元格
+
+# 差异名单：对比字段与输出列
+DELTA_KEY_COLUMNS = ['身份证号', '姓名', '年级', '班级']
+DELTA_COLUMNS = ['身份证号', '姓名', '变动类型', '原年级', '原班级', '现年级', '现班级']
+
 
 # ===========================================
 
@@ -35,7 +54,7 @@ def handle_old_file(file_path):
     print(f"⚠️  检测到已存在旧文件: {os.path.basename(file_path)}")
     print("请选择处理方式：")
     print("  [1] 🗑️  删除旧文件 (覆盖)")
-    print("  [2] 📦 归档并备份 (移至 '历史备份' 文件夹)")
+    print("  [2] 📦 归档并备份 (压缩存入 '历史备份' 文件夹)")
     print("  [3] ❌ 取消操作")
     print("!" * 50)
 
@@ -53,18 +72,10 @@ def handle_old_file(file_path):
 
         elif choice == '2':
             try:
-                if not os.path.exists(ARCHIVE_DIR):
-                    os.makedirs(ARCHIVE_DIR)
-
-                # 生成带时间戳的新文件名
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = os.path.basename(file_path)
-                name, ext = os.path.splitext(filename)
-                new_name = f"{name}_备份_{timestamp}{ext}"
-                dest_path = os.path.join(ARCHIVE_DIR, new_name)
-
-                shutil.move(file_path, dest_path)
-                print(f"📦 已归档至: {dest_path}")
+                name = os.path.splitext(os.path.basename(file_path))[0]
+                snapshot_id, _ = archive_store.create_snapshot(ARCHIVE_DIR, [file_path], label=name)
+                os.remove(file_path)
+                print(f"📦 已归档为快照 {snapshot_id} (位于: {ARCHIVE_DIR})")
                 return True
             except Exception as e:
                 print(f"❌ 归档失败: {e} (请检查文件是否被打开)")
@@ -125,76 +136,466 @@ def format_class_name(raw_grade, raw_class, grade_map):
     return f"{g_name} {c_name}"
 
 
+def compact_roster(df, category_columns=None):
+    """
+    将名单转换为紧凑的内部表示 (返回新表，原表可随即释放)：
+    年级/班级及重复值多的其他文本列 -> category，
+    姓名/身份证号等其余文本列 -> Arrow 字符串 (未安装 pyarrow 时改为字符串驻留)
+    category_columns 为 None 时按本表自动判断。返回 (紧凑名单, 原始列类型)，导出前用 expand_roster 还原
+    """
+    original_dtypes = df.dtypes.to_dict()
+    if category_columns is None:
+        category_columns = pick_category_columns(df)
+    string_dtype = _compact_string_dtype()
+
+    # 逐列构建新表，避免在原来的 object 数据块上原地替换列 (旧数据块会一直被引用)
+    compact = pd.DataFrame({
+        i: _compact_column(df.iloc[:, i], df.columns[i] in category_columns, string_dtype)
+        for i in range(df.shape[1])
+    })
+    compact.columns = df.columns
+    return compact, original_dtypes
+
+
+def pick_category_columns(df):
+    """年级/班级固定为分类列；其余文本列 (姓名/身份证号除外) 重复值较多时也转为分类列"""
+    picked = {col for col in CATEGORY_COLUMNS if col in df.columns}
+    limit = len(df) * EXTRA_CATEGORY_RATIO
+    for col in df.columns:
+        if col in picked or col in STRING_COLUMNS:
+            continue
+        if _is_text(df[col]) and df[col].nunique() <= limit:
+            picked.add(col)
+    return picked
+
+
+def _compact_column(series, as_category, string_dtype):
+    if as_category:
+        return series.astype('category')
+    # 只处理纯文本列，混有数字的列保持原样，避免导出时类型变化
+    if not _is_text(series) or _is_arrow_string(series.dtype):
+        return series  # pandas 3 默认已是 Arrow 字符串，无需再复制一次
+    if string_dtype:
+        return series.astype(string_dtype)
+    return series.map(lambda v: sys.intern(v) if isinstance(v, str) else v)
+
+
+def _is_text(series):
+    return pd.api.types.infer_dtype(series, skipna=True) == 'string'
+
+
+def expand_roster(df, original_dtypes):
+    """将紧凑名单还原为读取时的列类型 (仅在导出时调用)"""
+    for col, dtype in original_dtypes.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        restored = df[col].astype(dtype)
+        if dtype == object:
+            # Arrow 字符串的缺失值为 pd.NA，统一还原为 NaN
+            restored = restored.where(restored.notna(), float('nan'))
+        df[col] = restored
+    return df
+
+
+def _is_arrow_string(dtype):
+    return isinstance(dtype, pd.StringDtype) and dtype.storage == 'pyarrow'
+
+
+def _compact_string_dtype():
+    try:
+        import pyarrow  # noqa: F401
+        return 'string[pyarrow]'
+    except ImportError:
+        return None
+
+
+def _cell(df, col, pos, default):
+    return df[col].iat[pos] if col in df.columns else default
+
+
 def process_grade_data(grade_df, targets_map, grade_key):
-    processed_dfs = []
     summary_logs = []
     change_records = []
-    classes = grade_df['班级'].unique()
-    spare_pool = []
-    class_core_data = {}
+    # 班级转为整数编码，调剂过程只移动行号，不复制整行数据
+    class_codes, classes = pd.factorize(grade_df['班级'])
+    class_positions = [[] for _ in range(len(classes))]
+    for pos, code in enumerate(class_codes):
+        if code >= 0:
+            class_positions[code].append(pos)
+    spare_pool = deque()  # (行号, 原班级编码)
+    class_core_rows = {}
 
     # Step 1: 裁员
-    for cls in classes:
+    for code, cls in enumerate(classes):
         full_key = (grade_key, cls)
-        cls_df = grade_df[grade_df['班级'] == cls]
-        current_count = len(cls_df)
+        cls_rows = class_positions[code]
+        current_count = len(cls_rows)
         target = targets_map.get(full_key, current_count)
         if current_count > target:
-            keep_df = cls_df.iloc[:target]
-            spares_df = cls_df.iloc[target:]
-            class_core_data[cls] = keep_df
-            for idx, row in spares_df.iterrows():
-                row_dict = row.to_dict()
-                row_dict['_origin_class'] = cls
-                spare_pool.append(row_dict)
+            class_core_rows[code] = cls_rows[:target]
+            spare_pool.extend((pos, code) for pos in cls_rows[target:])
             log = {'班级': cls, '原': current_count, '实': target, '状态': f'📉 移出 {current_count - target} 人'}
         else:
-            class_core_data[cls] = cls_df
+            class_core_rows[code] = cls_rows
             log = {'班级': cls, '原': current_count, '实': target, '状态': '⚪ 待定'}
         summary_logs.append(log)
 
     # Step 2: 补员
-    for log in summary_logs:
+    row_order = []
+    final_codes = []
+    for code, log in enumerate(summary_logs):
         cls = log['班级']
         target = log['实']
-        current_data = class_core_data[cls]
-        current_len = len(current_data)
-        needed = target - current_len
-        final_cls_df = current_data.copy()
+        current_rows = class_core_rows[code]
+        row_order.extend(current_rows)
+        final_codes.extend([code] * len(current_rows))
+        needed = target - len(current_rows)
         if needed > 0:
-            borrowed_rows = []
             actual_borrowed = 0
             while needed > 0 and spare_pool:
-                row_dict = spare_pool.pop(0)
+                pos, origin_code = spare_pool.popleft()
                 change_records.append({
-                    '年级': grade_key, '姓名': row_dict.get('姓名', '未知'),
-                    '原班级': row_dict['_origin_class'], '操作': '借调变动',
-                    '现班级': cls, '身份证号': row_dict.get('身份证号', '')
+                    '年级': grade_key, '姓名': _cell(grade_df, '姓名', pos, '未知'),
+                    '原班级': classes[origin_code], '操作': '借调变动',
+                    '现班级': cls, '身份证号': _cell(grade_df, '身份证号', pos, '')
                 })
-                row_dict['班级'] = cls
-                del row_dict['_origin_class']
-                borrowed_rows.append(row_dict)
+                row_order.append(pos)
+                final_codes.append(code)
                 needed -= 1
                 actual_borrowed += 1
-            if borrowed_rows:
-                borrowed_df = pd.DataFrame(borrowed_rows)
-                final_cls_df = pd.concat([final_cls_df, borrowed_df], ignore_index=True)
             if needed == 0:
                 log['状态'] = f'📈 借入 {actual_borrowed} 人'
             else:
                 log['状态'] = f'⚠️ 借入 {actual_borrowed} (仍缺{needed})'
         elif log['状态'] == '⚪ 待定':
             log['状态'] = '✅ 无变化'
-        processed_dfs.append(final_cls_df)
+
+    # 按最终行号一次性取出本年级名单，再写回调剂后的班级
+    result_df = grade_df.iloc[row_order].reset_index(drop=True)
+    result_df['班级'] = classes.take(final_codes)
 
     # Step 3: 删除
-    for row_dict in spare_pool:
+    for pos, origin_code in spare_pool:
         change_records.append({
-            '年级': grade_key, '姓名': row_dict.get('姓名', '未知'),
-            '原班级': row_dict['_origin_class'], '操作': '彻底删除',
-            '现班级': '无', '身份证号': row_dict.get('身份证号', '')
+            '年级': grade_key, '姓名': _cell(grade_df, '姓名', pos, '未知'),
+            '原班级': classes[origin_code], '操作': '彻底删除',
+            '现班级': '无', '身份证号': _cell(grade_df, '身份证号', pos, '')
         })
-    return processed_dfs, summary_logs, change_records
+    return [result_df], summary_logs, change_records
+
+
+def reconcile_roster(df, targets_map, sorted_grades):
+    """按年级依次调剂，返回 (最终名单, 变动记录)；无数据时最终名单为 None"""
+    final_dfs = []
+    all_changes = []
+    grade_rows = df.groupby('年级', observed=True, sort=False).indices
+
+    for grade in sorted_grades:
+        if grade not in grade_rows:
+            continue
+        grade_df = df.iloc[grade_rows[grade]]
+        processed, logs, changes = process_grade_data(grade_df, targets_map, grade)
+        final_dfs.extend(processed)
+        all_changes.extend(changes)
+
+    result_df = pd.concat(final_dfs, ignore_index=True) if final_dfs else None
+    return result_df, pd.DataFrame(all_changes)
+
+
+def find_latest_archive():
+    """
+    查找历史备份中最近一次归档的最终核定表
+    返回 (显示名称, 归档时间, 可供 read_excel 读取的路径或文件对象)，没有则返回 None
+    """
+    if not os.path.exists(ARCHIVE_DIR):
+        return None
+
+    filename = os.path.basename(OUTPUT_FILE)
+    snapshot_id = archive_store.find_latest(ARCHIVE_DIR, filename)
+    if snapshot_id:
+        data = archive_store.read_file(ARCHIVE_DIR, snapshot_id, filename)
+        return f"快照 {snapshot_id}", _archive_time(snapshot_id), io.BytesIO(data)
+
+    # 兼容旧版按时间戳直接复制的备份文件
+    name, ext = os.path.splitext(filename)
+    prefix = f"{name}_备份_"
+    candidates = [f for f in os.listdir(ARCHIVE_DIR) if f.startswith(prefix) and f.endswith(ext)]
+    if not candidates:
+        return None
+    # 文件名中的时间戳可直接按字符串排序
+    latest = max(candidates)
+    return latest, _archive_time(os.path.splitext(latest)[0][len(prefix):]), os.path.join(ARCHIVE_DIR, latest)
+
+
+def _archive_time(stamp):
+    # 快照编号与旧版备份文件名都以 YYYYmmdd_HHMMSS 开头
+    try:
+        return datetime.strptime(stamp[:15], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def _as_text(series):
+    """统一转为文本，避免 Excel 读回后 2019 / 2019.0 / '2019' 互不相等"""
+
+    def convert(v):
+        if pd.isna(v):
+            return ''
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)
+        return str(v).strip()
+
+    return series.map(convert)
+
+
+def _delta_frame(df):
+    frame = df.reindex(columns=DELTA_KEY_COLUMNS)
+    frame = pd.DataFrame({col: _as_text(frame[col]) for col in DELTA_KEY_COLUMNS})
+    frame = frame[frame['身份证号'] != '']
+    return frame.drop_duplicates('身份证号', keep='last').set_index('身份证号')
+
+
+def build_delta(old_df, new_df):
+    """以身份证号为键 (哈希连接) 对比新旧名单，只保留新增、移除与调班的记录"""
+    old = _delta_frame(old_df)
+    new = _delta_frame(new_df)
+    merged = old.join(new, how='outer', lsuffix='_原', rsuffix='_现')
+
+    in_old = merged.index.isin(old.index)
+    in_new = merged.index.isin(new.index)
+    moved = in_old & in_new & ((merged['年级_原'] != merged['年级_现']) | (merged['班级_原'] != merged['班级_现']))
+
+    merged['变动类型'] = ''
+    merged.loc[in_new & ~in_old, '变动类型'] = '新增'
+    merged.loc[in_old & ~in_new, '变动类型'] = '移除'
+    merged.loc[moved, '变动类型'] = '调班'
+    merged['姓名'] = merged['姓名_现'].where(in_new, merged['姓名_原'])
+
+    delta = merged[merged['变动类型'] != ''].reset_index()
+    delta = delta.rename(columns={'年级_原': '原年级', '班级_原': '原班级', '年级_现': '现年级', '班级_现': '现班级'})
+    return delta[DELTA_COLUMNS].fillna('')
+
+
+def export_delta(result_df, run_started):
+    """与最近一次归档的最终核定表对比，写出差异名单 (run_started 之前的归档会提示不是本次归档)"""
+    try:
+        archive = find_latest_archive()
+    except Exception as e:
+        print(f"❌ 读取历史备份失败: {e}")
+        return
+    if archive is None:
+        return
+    archive_name, archived_at, archive_source = archive
+
+    if archived_at is None:
+        age = "归档时间未知"
+    elif archived_at >= run_started:
+        age = f"本次运行归档于 {archived_at:%Y-%m-%d %H:%M}"
+    else:
+        age = f"归档于 {archived_at:%Y-%m-%d %H:%M}，{(run_started - archived_at).days} 天前"
+        print("\n⚠️ 本次运行未归档旧核定表，只能与更早的备份对比，请确认是否为上一期名单。")
+
+    choice = input(f"\n👉 是否生成与上次核定表 ({archive_name}，{age}) 的差异名单？[y/N]: ").strip().lower()
+    if choice != 'y':
+        return
+
+    try:
+        old_df = pd.read_excel(archive_source, sheet_name='最终名单', dtype=str)
+        delta_df = build_delta(old_df, result_df)
+        delta_df.to_csv(DELTA_FILE, index=False, encoding='utf-8-sig')
+    except Exception as e:
+        print(f"❌ 差异名单生成失败: {e}")
+        return
+
+    counts = delta_df['变动类型'].value_counts()
+    print(f"📝 差异名单已保存至:\n   {DELTA_FILE}")
+    print(f"   新增 {counts.get('新增', 0)} | 移除 {counts.get('移除', 0)} | 调班 {counts.get('调班', 0)}")
+
+
+def load_roster(path=INPUT_FILE):
+    """
+    分块读取名单 (第一个工作表)，每块读入后立即转为紧凑表示，
+    不会同时持有完整的原始对象表和紧凑表。返回 (紧凑名单, 原始列类型)
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame(), {}
+        columns = _column_names(header)
+        width = len(columns)
+
+        chunks = []
+        chunk_dtypes = []
+        buffer = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue  # 与 read_excel 一致，跳过空行
+            if len(row) != width:
+                row = tuple(row[:width]) + (None,) * (width - len(row))
+            # 与 read_excel 一致：整数值的浮点单元格按整数读取 (如数字格式的身份证号)
+            buffer.append(tuple(int(v) if isinstance(v, float) and v.is_integer() else v for v in row))
+            if len(buffer) >= ROSTER_CHUNK_ROWS:
+                _append_chunk(buffer, columns, chunks, chunk_dtypes)
+                buffer = []
+        if buffer:
+            _append_chunk(buffer, columns, chunks, chunk_dtypes)
+    finally:
+        wb.close()
+
+    if not chunks:
+        return pd.DataFrame(columns=columns), {}
+    return _combine_chunks(chunks, chunk_dtypes)
+
+
+def _column_names(header):
+    # 与 read_excel 一致：空表头记为 Unnamed: n，重复表头追加 .1 .2
+    columns = []
+    seen = {}
+    for i, h in enumerate(header):
+        name = h if h is not None else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _append_chunk(rows, columns, chunks, chunk_dtypes):
+    chunk = pd.DataFrame(rows, columns=columns)
+    # 分类列由第一块决定，保证各块类型一致、可以直接拼接
+    category_columns = None
+    if chunks:
+        category_columns = {col for col in columns if isinstance(chunks[0][col].dtype, pd.CategoricalDtype)}
+    chunk, dtypes = compact_roster(chunk, category_columns)
+    chunks.append(chunk)
+    chunk_dtypes.append(dtypes)
+
+
+def _combine_chunks(chunks, chunk_dtypes):
+    # 各块推断的类型一致时沿用，否则 (如某块出现空值或文本) 按 object 还原
+    original_dtypes = {}
+    for col in chunks[0].columns:
+        seen = {dtypes[col] for dtypes in chunk_dtypes}
+        original_dtypes[col] = seen.pop() if len(seen) == 1 else object
+
+    # 统一各块的类别，拼接后仍保持 category，不会退化为 object
+    for col in chunks[0].columns:
+        if not isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            continue
+        try:
+            categories = union_categoricals([chunk[col].array for chunk in chunks]).categories
+        except TypeError:
+            # 各块类别的类型不同 (数字与文本混合)，拼接后再整体转换
+            for chunk in chunks:
+                chunk[col] = chunk[col].astype(object)
+            continue
+        for chunk in chunks:
+            chunk[col] = chunk[col].cat.set_categories(categories)
+
+    df = pd.concat(chunks, ignore_index=True)
+    chunks.clear()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df, original_dtypes
+
+
+def build_class_list(df):
+    """返回 (年级映射, 排序后的班级列表, 各班现有人数)"""
+    grade_map = generate_grade_map(df)
+    unique_classes = df[['年级', '班级']].drop_duplicates().values.tolist()
+    sorted_classes = sorted(unique_classes, key=lambda x: get_class_sort_key(x[0], x[1], grade_map))
+
+    class_sizes = df.groupby(['年级', '班级'], observed=True, sort=False).size().to_dict()
+    original_counts = {(g, c): class_sizes.get((g, c), 0) for g, c in sorted_classes}
+    return grade_map, sorted_classes, original_counts
+
+
+def get_sorted_grades(sorted_classes):
+    sorted_grades = []
+    seen = set()
+    for g, c in sorted_classes:
+        if g not in seen: sorted_grades.append(g); seen.add(g)
+    return sorted_grades
+
+
+def _json_value(v):
+    # numpy 标量转为 Python 原生类型，便于写入 JSON
+    return v.item() if hasattr(v, 'item') else v
+
+
+def save_targets(targets_map):
+    """保存本次确认的各班目标人数，供监听模式自动重算"""
+    records = [[_json_value(g), _json_value(c), int(n)] for (g, c), n in targets_map.items()]
+    try:
+        with open(TARGETS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=1)
+    except Exception as e:
+        print(f"⚠️ 目标人数保存失败: {e}")
+
+
+def load_saved_targets():
+    """读取上次保存的各班目标人数，没有则返回 None"""
+    if not os.path.exists(TARGETS_FILE):
+        return None
+    with open(TARGETS_FILE, 'r', encoding='utf-8') as f:
+        return {(g, c): n for g, c, n in json.load(f)}
+
+
+def save_result(result_df, change_df):
+    """写出最终核定表，返回是否成功"""
+    try:
+        with pd.ExcelWriter(OUTPUT_FILE) as writer:
+            result_df.to_excel(writer, sheet_name='最终名单', index=False)
+            if not change_df.empty:
+                change_df.to_excel(writer, sheet_name='变动记录', index=False)
+            else:
+                pd.DataFrame({'提示': ['无变动']}).to_excel(writer, sheet_name='变动记录', index=False)
+        print(f"\n🎉 处理完成！文件已保存至:\n   {OUTPUT_FILE}")
+        return True
+    except Exception as e:
+        print(f"❌ 保存失败: {e}")
+        return False
+
+
+def reconcile_with_saved_targets():
+    """
+    无交互地按上次保存的目标人数重新核算 (供监听模式调用)
+    旧的最终核定表自动归档，返回是否成功
+    """
+    init_workspace()
+    targets = load_saved_targets()
+    if targets is None:
+        print(f"⚠️ 未找到 {os.path.basename(TARGETS_FILE)}，请先通过菜单 [1] 完成一次核算。")
+        return False
+
+    try:
+        df, original_dtypes = load_roster()
+    except Exception as e:
+        print(f"❌ 读取失败: {e}")
+        return False
+
+    grade_map, sorted_classes, original_counts = build_class_list(df)
+    # 新出现的班级没有保存的目标，按现有人数处理
+    targets_map = {key: targets.get(key, count) for key, count in original_counts.items()}
+
+    if os.path.exists(OUTPUT_FILE):
+        name = os.path.splitext(os.path.basename(OUTPUT_FILE))[0]
+        try:
+            snapshot_id, _ = archive_store.create_snapshot(ARCHIVE_DIR, [OUTPUT_FILE], label=name)
+        except Exception as e:
+            print(f"❌ 归档失败: {e}")
+            return False
+        print(f"📦 旧核定表已归档为快照 {snapshot_id}")
+
+    result_df, change_df = reconcile_roster(df, targets_map, get_sorted_grades(sorted_classes))
+    if result_df is None:
+        return False
+    return save_result(expand_roster(result_df, original_dtypes), change_df)
 
 
 def run_student_manager():
@@ -209,23 +610,15 @@ def run_student_manager():
 
     try:
         print("📂 正在读取源文件...")
-        df = pd.read_excel(INPUT_FILE)
+        df, original_dtypes = load_roster()
     except Exception as e:
         print(f"❌ 读取失败: {e}")
         input("按回车键返回...")
         return
 
-    grade_map = generate_grade_map(df)
-    unique_classes = df[['年级', '班级']].drop_duplicates().values.tolist()
-    sorted_classes = sorted(unique_classes, key=lambda x: get_class_sort_key(x[0], x[1], grade_map))
+    grade_map, sorted_classes, original_counts = build_class_list(df)
     total_classes = len(sorted_classes)
-
-    targets_map = {}
-    original_counts = {}
-    for g, c in sorted_classes:
-        curr = len(df[(df['年级'] == g) & (df['班级'] == c)])
-        original_counts[(g, c)] = curr
-        targets_map[(g, c)] = curr
+    targets_map = dict(original_counts)
 
     print(f"✅ 读取成功！共 {total_classes} 个班级。")
     time.sleep(0.5)
@@ -293,40 +686,22 @@ def run_student_manager():
     # ================= 核心修改：保存前的冲突检测 =================
 
     # 在计算前先确认用户是否想继续（如果旧文件处理失败，这里就不必计算了）
+    run_started = datetime.now().replace(microsecond=0)
     if os.path.exists(OUTPUT_FILE):
         if not handle_old_file(OUTPUT_FILE):
             input("按回车键返回...")
             return
 
-    print("\n⏳ 正在计算...")
-    final_dfs = []
-    all_changes = []
+    save_targets(targets_map)
 
-    sorted_grades = []
-    seen = set()
-    for g, c in sorted_classes:
-        if g not in seen: sorted_grades.append(g); seen.add(g)
-
-    for grade in sorted_grades:
-        grade_df = df[df['年级'] == grade]
-        processed, logs, changes = process_grade_data(grade_df, targets_map, grade)
-        final_dfs.extend(processed)
-        all_changes.extend(changes)
+    print("\n⏳ 正在计算...")
 
-    if final_dfs:
-        result_df = pd.concat(final_dfs)
-        change_df = pd.DataFrame(all_changes)
+    result_df, change_df = reconcile_roster(df, targets_map, get_sorted_grades(sorted_classes))
 
-        try:
-            with pd.ExcelWriter(OUTPUT_FILE) as writer:
-                result_df.to_excel(writer, sheet_name='最终名单', index=False)
-                if not change_df.empty:
-                    change_df.to_excel(writer, sheet_name='变动记录', index=False)
-                else:
-                    pd.DataFrame({'提示': ['无变动']}).to_excel(writer, sheet_name='变动记录', index=False)
-            print(f"\n🎉 处理完成！文件已保存至:\n   {OUTPUT_FILE}")
-        except Exception as e:
-            print(f"❌ 保存失败: {e}")
+    if result_df is not None:
+        result_df = expand_roster(result_df, original_dtypes)
+        if save_result(result_df, change_df):
+            export_delta(result_df, run_started)
 
     input("\n按回车键返回主菜单...")
 
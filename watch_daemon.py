@@ -0,0 +1,160 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import manager_inventory
+import manager_students
+
+# ================= 配置区域 =================
+DATA_DIR = 'data'
+STATUS_FILE = os.path.join(DATA_DIR, 'watch_status.json')  # 对外：最近一次运行的时间与耗时
+STATE_FILE = os.path.join(DATA_DIR, '.watch_state.json')   # 内部：各采购日期的内容指纹
+
+POLL_INTERVAL = 1  # 秒，检查文件变化的间隔
+DEBOUNCE = 3       # 秒，文件停止变化这么久之后才处理 (Excel 保存会连续写入多次)
+
+
+# ===========================================
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def _load_state():
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def sync_inventory(state):
+    """采购清单变化：只重新生成内容有变化的日期"""
+    manager_inventory.init_workspace()
+    df = manager_inventory.load_purchase_list()
+    if df is None:
+        return False, "采购清单读取失败"
+
+    previous = state.get('inventory', {})
+    signatures, generated = manager_inventory.regenerate_changed_dates(df, previous)
+    state['inventory'] = signatures
+    _save_json(STATE_FILE, state)
+
+    for date_str in generated:
+        print(f"   ✅ 重新生成: {date_str}.xls")
+    removed = sorted(set(previous) - set(signatures))
+    if removed:
+        print(f"   ⚠️ 以下日期已不在采购清单中 (旧入库单未删除): {', '.join(removed)}")
+    return True, f"重新生成 {len(generated)} 个日期"
+
+
+def init_inventory_state(state):
+    """
+    启动时建立采购清单的基准指纹：
+    首次监听时只信任比采购清单更新的入库单，记为最新；其余日期 (入库单缺失或可能过期) 立即重新生成一次。
+    已有记录时补做一次同步，处理未监听期间的修改
+    """
+    if not os.path.exists(manager_inventory.INPUT_FILE):
+        return
+    name = os.path.basename(manager_inventory.INPUT_FILE)
+    if 'inventory' in state:
+        run_job(name, sync_inventory, state)
+        return
+
+    df = manager_inventory.load_purchase_list()
+    if df is None:
+        return
+    input_mtime = os.path.getmtime(manager_inventory.INPUT_FILE)
+    state['inventory'] = manager_inventory.date_signatures(df, newer_than=input_mtime)
+    _save_json(STATE_FILE, state)
+    print(f"📌 已记录 {len(state['inventory'])} 个比采购清单更新的入库单作为基准。")
+
+    if len(state['inventory']) < df['采购日期'].nunique():
+        run_job(name, sync_inventory, state)
+
+
+def sync_roster(state):
+    """学生名单变化：按上次保存的目标人数重新核算"""
+    if manager_students.reconcile_with_saved_targets():
+        return True, "名单已按上次目标人数重新核算"
+    return False, "名单核算失败"
+
+
+def run_job(name, job, state):
+    print("\n" + "-" * 50)
+    print(f"🔔 [{datetime.now():%H:%M:%S}] 检测到 {name} 已更新，开始处理...")
+    start = time.time()
+    try:
+        success, detail = job(state)
+    except Exception as e:
+        success, detail = False, f"异常: {e}"
+    duration = time.time() - start
+
+    print(f"{'✅' if success else '❌'} {detail} (耗时 {duration:.1f} 秒)")
+    try:
+        _save_json(STATUS_FILE, {
+            'last_run': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'duration_seconds': round(duration, 2),
+            'trigger': name,
+            'success': success,
+            'detail': detail,
+        })
+    except Exception as e:
+        print(f"⚠️ 状态文件写入失败: {e}")
+
+
+def run_watch_mode():
+    print("\n" + "=" * 50)
+    print("👀 监听模式")
+    print("说明：采购清单或学生名单一旦保存，自动重新生成入库单 / 重新核算名单。")
+    print("=" * 50)
+
+    watched = {
+        manager_inventory.INPUT_FILE: sync_inventory,
+        manager_students.INPUT_FILE: sync_roster,
+    }
+    for path in watched:
+        print(f"   📄 {path}")
+    print(f"📝 状态文件: {STATUS_FILE}")
+    print("⌨️  按 Ctrl+C 停止监听并返回主菜单。")
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    state = _load_state()
+    last_seen = {path: _file_stamp(path) for path in watched}
+    init_inventory_state(state)
+    pending = {}  # 路径 -> 最后一次发现变化的时间
+
+    try:
+        while True:
+            time.sleep(POLL_INTERVAL)
+            now = time.time()
+
+            for path, job in watched.items():
+                stamp = _file_stamp(path)
+                if stamp != last_seen[path]:
+                    last_seen[path] = stamp
+                    pending[path] = now
+                    continue
+
+                if path in pending and now - pending[path] >= DEBOUNCE:
+                    del pending[path]
+                    if stamp is not None:
+                        run_job(os.path.basename(path), job, state)
+    except KeyboardInterrupt:
+        print("\n🛑 已停止监听。")
+
+
+if __name__ == "__main__":
+    run_watch_mode()